@@ -3,24 +3,44 @@
 import json
 import os
 import time
+from functools import lru_cache
 from dotenv import load_dotenv
 load_dotenv()
 
 def _get_user_display_name() -> str:
     """Fetch the user display name from the From header of a sent email."""
     try:
-        from gmail_tools import get_gmail_service
+        from gmail_tools import get_gmail_service, get_user_email, _header_map
         service = get_gmail_service()
-        profile = service.users().getProfile(userId='me').execute()
-        user_email = profile.get('emailAddress', '').lower()
+        user_email = get_user_email()
 
         results = service.users().messages().list(
-            userId='me', labelIds=['SENT'], maxResults=10
+            userId='me', labelIds=['SENT'], maxResults=10,
+            fields='messages(id),nextPageToken'
         ).execute()
-        for msg in results.get('messages', []):
-            full = service.users().messages().get(userId='me', id=msg['id']).execute()
-            headers = full.get('payload', {}).get('headers', [])
-            from_header = next((h['value'] for h in headers if h['name'] == 'From'), '')
+        sent_messages = results.get('messages', [])
+
+        # Fetch all sent-message headers in one batched round trip instead
+        # of up to 10 serial GETs.
+        metadata = {}
+
+        def _collect(request_id, response, exception):
+            if exception is None:
+                metadata[request_id] = response
+
+        batch = service.new_batch_http_request(callback=_collect)
+        for msg in sent_messages:
+            batch.add(
+                service.users().messages().get(
+                    userId='me', id=msg['id'], format='metadata',
+                    metadataHeaders=['From']
+                ),
+                request_id=msg['id'],
+            )
+        batch.execute()
+
+        for msg in sent_messages:
+            from_header = _header_map(metadata.get(msg['id'], {})).get('From', '')
             # Format: "Sarah Ravitz <sr7677876@gmail.com>"
             if '<' in from_header and user_email in from_header.lower():
                 name = from_header.split('<')[0].strip().strip('"')
@@ -30,15 +50,27 @@ def _get_user_display_name() -> str:
     except Exception:
         return "Your Name"
 
-USER_NAME = _get_user_display_name()
+@lru_cache(maxsize=1)
+def get_user_name() -> str:
+    """Lazily fetch and cache the user's display name.
+
+    Resolving the name requires Gmail authentication and several API calls,
+    so it must not run at import time — only when a prompt is actually built.
+    """
+    return _get_user_display_name()
+
+import random
 
+import openai
 from openai import OpenAI
-from gmail_tools import search_emails, read_email_content, send_reply
+from gmail_tools import search_emails, read_email_content, send_reply, reset_turn_cache
 
 client = OpenAI()
 
-# Tools definition for OpenAI function calling
-TOOLS = [
+# Tools definition for OpenAI function calling.
+# Built once at import and passed by reference to every request; kept as an
+# immutable tuple so nothing can force a rebuild or per-call copy.
+TOOLS = (
     {
         "type": "function",
         "function": {
@@ -91,7 +123,7 @@ TOOLS = [
             }
         }
     }
-]
+)
 
 TOOL_FUNCTIONS = {
     "search_emails": search_emails,
@@ -99,7 +131,7 @@ TOOL_FUNCTIONS = {
     "send_reply": send_reply,
 }
 
-SYSTEM_PROMPT = f"""You are an email assistant. You help users respond to their emails.
+_SYSTEM_PROMPT_TEMPLATE = """You are an email assistant. You help users respond to their emails.
 
 When searching for emails, ALWAYS return results in this EXACT format (no markdown, no bold):
 ID: <message_id>
@@ -116,7 +148,7 @@ When the user selects an email:
 1. Read its content using read_email_content
 2. Draft a professional reply:
    - Extract the sender's name from the "From" field and use it
-   - Sign the email with {USER_NAME}
+   - Sign the email with {user_name}
    - Match the tone of the original email
    - Keep it concise and relevant
 3. Present the draft between --- markers like this:
@@ -140,30 +172,100 @@ Important:
 - If a NOTE says "This email was sent by you to X and has not received a reply yet", draft a follow-up message addressed TO that recipient X, not to the user"""
 
 
-def _call_openai_with_retry(messages: list, max_retries: int = 3, retry_delay: float = 2.0):
+@lru_cache(maxsize=1)
+def get_system_prompt() -> str:
+    """Build the system prompt on first use (resolving the user name is expensive)."""
+    return _SYSTEM_PROMPT_TEMPLATE.format(user_name=get_user_name())
+
+
+# Transient errors worth retrying; auth/invalid-request errors are not.
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def _accumulate_stream(stream) -> dict:
+    """Collect a streamed completion into an assistant message dict.
+
+    Streaming lets us start handling the response as soon as the final chunk
+    arrives instead of waiting for the server to finish composing the full
+    body. Content and tool-call deltas are merged into the same shape the
+    chat API accepts back in the message history.
+    """
+    content_parts = []
+    tool_calls = {}
+
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta is None:
+            continue
+        if delta.content:
+            content_parts.append(delta.content)
+        for tc in delta.tool_calls or []:
+            call = tool_calls.setdefault(tc.index, {
+                "id": "",
+                "type": "function",
+                "function": {"name": "", "arguments": ""},
+            })
+            if tc.id:
+                call["id"] = tc.id
+            if tc.function:
+                if tc.function.name:
+                    call["function"]["name"] += tc.function.name
+                if tc.function.arguments:
+                    call["function"]["arguments"] += tc.function.arguments
+
+    message = {"role": "assistant", "content": "".join(content_parts) or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
+    return message
+
+
+def _call_openai_with_retry(messages: list, max_retries: int = 3, retry_delay: float = 2.0) -> dict:
     """
-    Call the OpenAI API with automatic retry on failure.
-    Retries up to max_retries times with a delay between attempts.
+    Call the OpenAI API with automatic retry on transient failures.
+    Streams the completion and returns the accumulated assistant message.
+    Uses exponential backoff with full jitter between attempts; non-retryable
+    errors (bad auth, invalid request) are raised immediately.
     Raises RuntimeError if all attempts fail.
     """
     last_error = None
     for attempt in range(1, max_retries + 1):
         try:
-            return client.chat.completions.create(
+            stream = client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=messages,
                 tools=TOOLS,
                 tool_choice="auto",
-                timeout=30.0
+                timeout=30.0,
+                stream=True
             )
-        except Exception as e:
+            return _accumulate_stream(stream)
+        except _RETRYABLE_ERRORS as e:
             last_error = e
             if attempt < max_retries:
-                print(f"\nAgent: OpenAI request failed (attempt {attempt}/{max_retries}). Retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
+                # Exponential backoff with full jitter, capped at 60s
+                delay = min(retry_delay * (2 ** (attempt - 1)), 60.0) * random.random()
+                print(f"\nAgent: OpenAI request failed (attempt {attempt}/{max_retries}). Retrying in {delay:.1f}s...")
+                time.sleep(delay)
     raise RuntimeError(f"OpenAI API unavailable after {max_retries} attempts: {last_error}")
 
 
+@lru_cache(maxsize=128)
+def _parse_tool_args(arguments: str) -> dict:
+    """Parse tool-call JSON arguments, caching by the raw argument string.
+
+    The same arguments often recur within a session (e.g. re-reading the
+    same message id), so repeat parses become a dict lookup.
+    """
+    return json.loads(arguments)
+
+
 def run_tool(tool_name: str, tool_args: dict) -> str:
     """Execute a tool and return the result as a string."""
     fn = TOOL_FUNCTIONS.get(tool_name)
@@ -181,23 +283,23 @@ def chat(messages: list) -> tuple[str, list]:
     Returns (response_text, updated_messages)
     """
     while True:
-        response = _call_openai_with_retry(messages)
-
-        message = response.choices[0].message
+        reset_turn_cache()
+        message = _call_openai_with_retry(messages)
         messages.append(message)
 
-        if not message.tool_calls:
-            return message.content, messages
+        tool_calls = message.get("tool_calls")
+        if not tool_calls:
+            return message.get("content") or "", messages
 
-        for tool_call in message.tool_calls:
-            tool_name = tool_call.function.name
-            tool_args = json.loads(tool_call.function.arguments)
+        for tool_call in tool_calls:
+            tool_name = tool_call["function"]["name"]
+            tool_args = dict(_parse_tool_args(tool_call["function"]["arguments"]))
 
             print(f"\nAgent: [Calling {tool_name}...]")
             result = run_tool(tool_name, tool_args)
 
             messages.append({
                 "role": "tool",
-                "tool_call_id": tool_call.id,
+                "tool_call_id": tool_call["id"],
                 "content": result
             })
\ No newline at end of file
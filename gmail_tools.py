@@ -1,18 +1,125 @@
 # -*- coding: utf-8 -*-
+import contextvars
+import functools
 import os
+import threading
+import time
 import base64
-from email.message import EmailMessage
+import binascii
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 import html
+from email.header import Header
+from email.utils import formataddr, parseaddr
 from sanitizer import sanitize_email_content
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 
+# Cached Gmail state: credentials and the user's email address are
+# process-wide (immutable once loaded), but the service is cached per
+# thread — httplib2.Http is not thread-safe, and the prefetch pool in
+# main.py calls Gmail concurrently with the main thread, so each thread
+# needs its own transport.
+_LOCAL = threading.local()
+_CREDS = None
+_CREDS_LOCK = threading.Lock()
+_USER_EMAIL = None
+
+# Lazy singleton for pyspellchecker — loading its dictionary is expensive,
+# so it is built once on first use and reused for the whole session.
+_SPELL = None
+
+
+def _spell():
+    global _SPELL
+    if _SPELL is None:
+        from spellchecker import SpellChecker
+        _SPELL = SpellChecker()
+    return _SPELL
+
+
+# Gmail read results change rarely within an interactive session, so the
+# read helpers cache results for a short TTL. send_reply clears the caches
+# after a successful send so fresh replies are picked up immediately.
+_CACHE_TTL = 120.0
+_ttl_caches = []
+
+# Message-ID -> thread_id index filled by search_emails, so that
+# read_email_content can skip the lookup round trip for messages the
+# user just searched for.
+_MSGID_TO_THREAD = {}
+
+# Queries that are too short or already well-formed English words won't
+# produce a useful typo suggestion — skip the broad fallback fetch for them.
+_COMMON_WORDS = frozenset({
+    'the', 'and', 'for', 'from', 'with', 'about', 'that', 'this', 'your',
+    'meeting', 'invoice', 'order', 'project', 'report', 'update', 'offer',
+    'hello', 'thanks', 'reminder', 'payment', 'interview', 'newsletter',
+})
+
+
+def _ttl_cache(func):
+    """Cache a function's results for _CACHE_TTL seconds, keyed by arguments."""
+    cache = {}
+    _ttl_caches.append(cache)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Tool calls arrive as keyword arguments (run_tool does fn(**args)),
+        # so kwargs must be accepted and folded into the cache key.
+        key = args + tuple(sorted(kwargs.items())) if kwargs else args
+        now = time.monotonic()
+        hit = cache.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        if len(cache) > 256:
+            cache.clear()
+        value = func(*args, **kwargs)
+        cache[key] = (now + _CACHE_TTL, value)
+        return value
+
+    return wrapper
+
+
+def _clear_ttl_caches():
+    for cache in _ttl_caches:
+        cache.clear()
+
+
+# Per-turn cache: helpers invoked while handling a single agent turn often
+# need the same thread; scoping the cache to the turn (via contextvars)
+# shares those fetches without holding results beyond the turn.
+_turn_cache = contextvars.ContextVar('gmail_turn_cache', default=None)
+
+
+def reset_turn_cache():
+    """Start a fresh per-turn cache; the agent loop calls this each iteration."""
+    _turn_cache.set({})
+
+
+def _turn_cached(key, fetch):
+    """Return fetch() for key, shared across helpers within the current turn."""
+    cache = _turn_cache.get()
+    if cache is None:
+        return fetch()
+    if key not in cache:
+        cache[key] = fetch()
+    return cache[key]
+
+
+def _header_map(msg: dict) -> dict:
+    """Build a name -> value dict from a message's headers in one pass.
+
+    Replaces repeated linear scans of the header list with O(1) lookups.
+    """
+    return {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
+
 
 def _clean_snippet(raw_snippet: str, max_length: int = 120) -> str:
     """
@@ -33,18 +140,25 @@ def _clean_snippet(raw_snippet: str, max_length: int = 120) -> str:
 
 # Common typo corrections for email search
 def _levenshtein(a: str, b: str) -> int:
-    """Calculate the edit distance between two strings."""
-    rows, cols = len(a) + 1, len(b) + 1
-    dp = [[0] * cols for _ in range(rows)]
-    for i in range(rows):
-        dp[i][0] = i
-    for j in range(cols):
-        dp[0][j] = j
-    for i in range(1, rows):
-        for j in range(1, cols):
-            cost = 0 if a[i - 1] == b[j - 1] else 1
-            dp[i][j] = min(dp[i-1][j] + 1, dp[i][j-1] + 1, dp[i-1][j-1] + cost)
-    return dp[-1][-1]
+    """Calculate the edit distance between two strings.
+
+    Uses two rolling rows instead of a full DP matrix, keeping the inner
+    loop free of nested-list indexing — much faster and O(min(len)) memory.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        curr = [i]
+        append = curr.append
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            append(min(prev[j] + 1, curr[j - 1] + 1, prev[j - 1] + cost))
+        prev = curr
+    return prev[-1]
 
 
 def _suggest_correction(query: str, found_subjects: list[str]) -> str:
@@ -53,6 +167,8 @@ def _suggest_correction(query: str, found_subjects: list[str]) -> str:
     Only suggests if the distance is small enough to be a plausible typo.
     """
     query_lower = query.lower()
+    # Allow up to 2 edits, and only if the word is not much longer
+    max_allowed = min(2, len(query_lower) // 2)
     best_word = ""
     best_score = float("inf")
 
@@ -60,9 +176,11 @@ def _suggest_correction(query: str, found_subjects: list[str]) -> str:
         for word in subject.lower().split():
             if len(word) < 3:
                 continue
+            # Edit distance is at least the length difference, so anything
+            # further apart than max_allowed can be skipped without the DP.
+            if abs(len(word) - len(query_lower)) > max_allowed:
+                continue
             distance = _levenshtein(query_lower, word)
-            # Allow up to 2 edits, and only if the word is not much longer
-            max_allowed = min(2, len(query_lower) // 2)
             if distance <= max_allowed and distance < best_score:
                 best_score = distance
                 best_word = word
@@ -71,16 +189,17 @@ def _suggest_correction(query: str, found_subjects: list[str]) -> str:
 
 
 
+@functools.lru_cache(maxsize=128)
 def suggest_search_correction(query: str) -> str:
     """
     Public function: uses pyspellchecker to correct typos in the search query.
     If a correction is found, searches Gmail with the corrected term.
     Called directly from main.py when no emails were found for the search term.
+    The result is deterministic per query, so repeats within a session are
+    answered from an lru_cache.
     """
     try:
-        from spellchecker import SpellChecker
-        spell = SpellChecker()
-        corrected = spell.correction(query.lower())
+        corrected = _spell().correction(query.lower())
         if corrected and corrected != query.lower():
             return corrected
         return ""
@@ -89,62 +208,72 @@ def suggest_search_correction(query: str) -> str:
     except Exception:
         return ""
 
-def get_last_reply(thread_id: str) -> str:
+def _last_reply_snippet(messages: list, user_email: str) -> str:
     """
-    Checks if the user was the last to reply in this thread.
-    Returns the snippet of their last reply, or empty string if they were not last.
+    Given a thread's message list, return the snippet of the user's last
+    reply, or empty string if the user was not the last to reply.
     """
-    try:
-        service = get_gmail_service()
-        profile = service.users().getProfile(userId='me').execute()
-        user_email = profile.get('emailAddress', '').lower()
+    if not messages:
+        return ""
 
-        thread = service.users().threads().get(userId='me', id=thread_id).execute()
-        messages = thread.get('messages', [])
+    # If the thread has only one message and it was sent by the user,
+    # this is an outgoing email the user created — not a reply.
+    # Only flag as "already replied" if the user sent a message AFTER the first one.
+    first_sender = _header_map(messages[0]).get('From', '').lower()
+    user_created_thread = user_email in first_sender
 
-        if not messages:
-            return ""
+    if user_created_thread and len(messages) == 1:
+        return ""
 
-        # If the thread has only one message and it was sent by the user,
-        # this is an outgoing email the user created — not a reply.
-        # Only flag as "already replied" if the user sent a message AFTER the first one.
-        first_msg_headers = messages[0].get('payload', {}).get('headers', [])
-        first_sender = next((h['value'] for h in first_msg_headers if h['name'] == 'From'), '').lower()
-        user_created_thread = user_email in first_sender
+    last_msg = messages[-1]
+    sender = _header_map(last_msg).get('From', '').lower()
 
-        if user_created_thread and len(messages) == 1:
+    if user_email in sender:
+        # Make sure it's not just the original message
+        if user_created_thread and last_msg == messages[0]:
             return ""
+        return _clean_snippet(last_msg.get('snippet', ''))
 
-        last_msg = messages[-1]
-        headers = last_msg.get('payload', {}).get('headers', [])
-        sender = next((h['value'] for h in headers if h['name'] == 'From'), '').lower()
+    return ""
 
-        if user_email in sender:
-            # Make sure it's not just the original message
-            if user_created_thread and last_msg == messages[0]:
-                return ""
-            snippet = _clean_snippet(last_msg.get('snippet', ''))
-            return snippet
 
-        return ""
+@_ttl_cache
+def get_last_reply(thread_id: str) -> str:
+    """
+    Checks if the user was the last to reply in this thread.
+    Returns the snippet of their last reply, or empty string if they were not last.
+    """
+    try:
+        service = get_gmail_service()
+        user_email = get_user_email()
+
+        thread = _turn_cached(('thread', thread_id), lambda: service.users().threads().get(
+            userId='me', id=thread_id, format='metadata',
+            metadataHeaders=['From'],
+            fields='messages(id,payload/headers,snippet)'
+        ).execute())
+        return _last_reply_snippet(thread.get('messages', []), user_email)
 
     except Exception:
         return ""
 
 
+@_ttl_cache
 def check_already_replied(thread_id: str) -> bool:
     """Check if the user has already sent a reply in this email thread."""
     try:
         service = get_gmail_service()
-        profile = service.users().getProfile(userId='me').execute()
-        user_email = profile.get('emailAddress', '').lower()
+        user_email = get_user_email()
 
-        thread = service.users().threads().get(userId='me', id=thread_id).execute()
+        thread = _turn_cached(('thread', thread_id), lambda: service.users().threads().get(
+            userId='me', id=thread_id, format='metadata',
+            metadataHeaders=['From'],
+            fields='messages(id,payload/headers,snippet)'
+        ).execute())
         messages = thread.get('messages', [])
 
         for msg in messages[1:]:
-            headers = msg.get('payload', {}).get('headers', [])
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), '').lower()
+            sender = _header_map(msg).get('From', '').lower()
             if user_email in sender:
                 return True
         return False
@@ -153,52 +282,103 @@ def check_already_replied(thread_id: str) -> bool:
         return False
 
 
+def _get_credentials():
+    """Load OAuth credentials once per process, refreshing only when expired.
+
+    Serialized by a lock: threads building their per-thread service must not
+    race the token refresh (or the OAuth flow) against each other.
+    """
+    global _CREDS
+    with _CREDS_LOCK:
+        creds = _CREDS
+
+        if creds is None and os.path.exists('token.json'):
+            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                if not os.path.exists('credentials.json'):
+                    raise FileNotFoundError(
+                        "credentials.json not found. "
+                        "Please download it from Google Cloud Console."
+                    )
+                flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+                creds = flow.run_local_server(port=0)
+
+            with open('token.json', 'w') as token:
+                token.write(creds.to_json())
+
+        _CREDS = creds
+        return creds
+
+
 def get_gmail_service():
-    """Authenticate and return Gmail API service."""
-    creds = None
+    """Authenticate and return Gmail API service (cached per thread).
 
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+    httplib2.Http is not thread-safe, so every thread gets its own
+    AuthorizedHttp transport over the shared credentials — one authenticated
+    TCP+TLS connection per thread, kept alive across calls instead of
+    re-handshaking per build. static_discovery uses the discovery document
+    bundled with the client library instead of fetching/parsing it per build.
+    """
+    service = getattr(_LOCAL, 'service', None)
+    if service is not None:
+        return service
 
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            if not os.path.exists('credentials.json'):
-                raise FileNotFoundError(
-                    "credentials.json not found. "
-                    "Please download it from Google Cloud Console."
-                )
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
+    authed_http = AuthorizedHttp(_get_credentials(), http=httplib2.Http(timeout=30))
+    service = build('gmail', 'v1', http=authed_http, static_discovery=True)
+    _LOCAL.service = service
+    return service
 
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
 
-    return build('gmail', 'v1', credentials=creds)
+def get_user_email() -> str:
+    """Return the authenticated user's email address (fetched once per process)."""
+    global _USER_EMAIL
+    if _USER_EMAIL is None:
+        service = get_gmail_service()
+        profile = service.users().getProfile(userId='me').execute()
+        _USER_EMAIL = profile.get('emailAddress', '').lower()
+    return _USER_EMAIL
 
 
+@_ttl_cache
 def search_emails(query: str) -> str:
-    """Search Gmail and return one result per thread."""
+    """Search Gmail and return one result per thread.
+
+    After the id listing, all message metadata and all unique threads are
+    fetched via batched HTTP requests (Gmail allows 100 calls per batch), so
+    a full search costs a fixed three round trips regardless of result count.
+    """
     try:
         service = get_gmail_service()
         results = service.users().messages().list(
-            userId='me', q=query, maxResults=10
+            userId='me', q=query, maxResults=10,
+            fields='messages(id,threadId),nextPageToken'
         ).execute()
         messages = results.get('messages', [])
 
         if not messages:
+            # A very short query or a correctly spelled common word will not
+            # yield a plausible typo correction — skip the 4 fallback calls.
+            if len(query) < 4 or query.lower() in _COMMON_WORDS:
+                return f"No emails found for '{query}'. Please try different keywords."
+
             broad_results = service.users().messages().list(
-                userId='me', q=query[:3], maxResults=5
+                userId='me', q=query[:3], maxResults=5,
+                fields='messages(id,threadId),nextPageToken'
             ).execute()
             broad_messages = broad_results.get('messages', [])
 
             if broad_messages:
                 subjects = []
                 for msg in broad_messages[:3]:
-                    full = service.users().messages().get(userId='me', id=msg['id']).execute()
-                    headers = full.get('payload', {}).get('headers', [])
-                    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
+                    full = service.users().messages().get(
+                        userId='me', id=msg['id'], format='metadata',
+                        metadataHeaders=['Subject']
+                    ).execute()
+                    subject = _header_map(full).get('Subject', '')
                     if subject:
                         subjects.append(subject)
 
@@ -208,38 +388,85 @@ def search_emails(query: str) -> str:
 
             return f"No emails found for '{query}'. Please try different keywords."
 
+        # Fetch all message metadata in a single batched HTTP request instead of
+        # one round trip per message (Gmail allows up to 100 calls per batch).
+        message_data = {}
+
+        def _collect_message(request_id, response, exception):
+            if exception is None:
+                message_data[request_id] = response
+
+        batch = service.new_batch_http_request(callback=_collect_message)
+        for msg in messages:
+            batch.add(
+                service.users().messages().get(
+                    userId='me', id=msg['id'], format='metadata',
+                    metadataHeaders=['Subject', 'From', 'Message-ID']
+                ),
+                request_id=msg['id'],
+            )
+        batch.execute()
+
+        # Second batch: fetch each unique thread once for the replied/outgoing checks
+        unique_thread_ids = []
+        for msg in messages:
+            thread_id = message_data.get(msg['id'], {}).get('threadId', '')
+            if thread_id and thread_id not in unique_thread_ids:
+                unique_thread_ids.append(thread_id)
+
+        thread_data_by_id = {}
+
+        def _collect_thread(request_id, response, exception):
+            if exception is None:
+                thread_data_by_id[request_id] = response
+
+        thread_batch = service.new_batch_http_request(callback=_collect_thread)
+        for thread_id in unique_thread_ids:
+            thread_batch.add(
+                service.users().threads().get(
+                    userId='me', id=thread_id, format='metadata',
+                    metadataHeaders=['From', 'To'],
+                    fields='messages(id,payload/headers,snippet)'
+                ),
+                request_id=thread_id,
+            )
+        thread_batch.execute()
+
+        user_email = get_user_email()
+
         seen_threads = set()
         summaries = []
 
         for msg in messages:
-            full = service.users().messages().get(userId='me', id=msg['id']).execute()
+            full = message_data.get(msg['id'])
+            if not full:
+                continue
             thread_id = full.get('threadId', '')
+            if thread_id:
+                _MSGID_TO_THREAD[msg['id']] = thread_id
 
             if thread_id in seen_threads:
                 continue
             seen_threads.add(thread_id)
 
-            headers = full.get('payload', {}).get('headers', [])
-            subject  = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-            sender   = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-            msg_id   = next((h['value'] for h in headers if h['name'] == 'Message-ID'), '')
+            headers = _header_map(full)
+            subject  = headers.get('Subject', 'No Subject')
+            sender   = headers.get('From', 'Unknown')
+            msg_id   = headers.get('Message-ID', '')
             snippet  = _clean_snippet(full.get('snippet', ''))
 
-            last_reply = get_last_reply(thread_id)
+            # Both the "already replied" and "outgoing, no reply yet" checks
+            # reuse the thread fetched in the batch above — no extra round trips.
+            thread_messages = thread_data_by_id.get(thread_id, {}).get('messages', [])
+
+            last_reply = _last_reply_snippet(thread_messages, user_email)
             replied_note = (
                 f"\n[NOTE: You already replied to this thread. "
                 f"Your last reply was: \"{last_reply}\"]"
             ) if last_reply else ""
-
-            # Check if this is an outgoing email with no reply yet
-            service2 = get_gmail_service()
-            thread_data = service2.users().threads().get(userId='me', id=thread_id).execute()
-            thread_messages = thread_data.get('messages', [])
-            profile = service2.users().getProfile(userId='me').execute()
-            user_email = profile.get('emailAddress', '').lower()
-            first_headers = thread_messages[0].get('payload', {}).get('headers', []) if thread_messages else []
-            first_sender = next((h['value'] for h in first_headers if h['name'] == 'From'), '').lower()
-            to_address = next((h['value'] for h in first_headers if h['name'] == 'To'), '')
+            first_headers = _header_map(thread_messages[0]) if thread_messages else {}
+            first_sender = first_headers.get('From', '').lower()
+            to_address = first_headers.get('To', '')
             if user_email in first_sender and len(thread_messages) == 1:
                 replied_note = f"\n[NOTE: This email was sent by you to {to_address} and has not received a reply yet.]"
 
@@ -269,14 +496,17 @@ def read_email_content(message_id: str) -> str:
     """
     try:
         service = get_gmail_service()
-        profile = service.users().getProfile(userId='me').execute()
-        user_email = profile.get('emailAddress', '').lower()
-
-        # Get the message to find its thread
-        message = service.users().messages().get(
-            userId='me', id=message_id.strip(), format='full'
-        ).execute()
-        thread_id = message.get('threadId', '')
+        user_email = get_user_email()
+
+        # Find the message's thread — known already if it came from a search,
+        # otherwise one minimal lookup (only threadId is needed here)
+        message_id = message_id.strip()
+        thread_id = _MSGID_TO_THREAD.get(message_id, '')
+        if not thread_id:
+            message = service.users().messages().get(
+                userId='me', id=message_id, format='minimal'
+            ).execute()
+            thread_id = message.get('threadId', '')
 
         # Get the full thread
         thread = service.users().threads().get(userId='me', id=thread_id).execute()
@@ -284,11 +514,11 @@ def read_email_content(message_id: str) -> str:
 
         # Always read the first message to get original sender/recipient
         first_msg = thread_messages[0]
-        headers = first_msg.get('payload', {}).get('headers', [])
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-        sender  = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-        to      = next((h['value'] for h in headers if h['name'] == 'To'), '')
-        date    = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown')
+        headers = _header_map(first_msg)
+        subject = headers.get('Subject', 'No Subject')
+        sender  = headers.get('From', 'Unknown')
+        to      = headers.get('To', '')
+        date    = headers.get('Date', 'Unknown')
         body    = sanitize_email_content(_extract_body(first_msg.get('payload', {})))
 
         to_line = f"\nTo: {to}" if to else ""
@@ -307,49 +537,97 @@ def read_email_content(message_id: str) -> str:
         return f"Read error: {e}"
 
 
+# Translate URL-safe base64 to standard alphabet so the body can go through
+# binascii's C decoder directly — noticeably faster than urlsafe_b64decode
+# on large bodies.
+_URLSAFE_TABLE = bytes.maketrans(b'-_', b'+/')
+
+
+def _decode_body_data(data: str) -> str:
+    raw = data.encode('ascii').translate(_URLSAFE_TABLE)
+    raw += b'=' * (-len(raw) % 4)
+    return binascii.a2b_base64(raw).decode('utf-8', errors='replace')
+
+
 def _extract_body(payload: dict) -> str:
-    """Recursively extract plain-text body from email payload."""
-    parts = payload.get('parts', [])
-
-    if not parts:
-        data = payload.get('body', {}).get('data')
-        if data:
-            return base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
-        return 'No content found.'
-
-    for part in parts:
-        if part.get('mimeType') == 'text/plain':
-            data = part.get('body', {}).get('data')
+    """Extract the plain-text body from an email payload.
+
+    Single depth-first walk: at each multipart node the text/plain part wins,
+    otherwise the children are descended in order. Returns on first match
+    instead of re-walking the tree.
+    """
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        parts = node.get('parts', [])
+
+        if not parts:
+            data = node.get('body', {}).get('data')
             if data:
-                return base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+                return _decode_body_data(data)
+            continue
+
+        for part in parts:
+            if part.get('mimeType') == 'text/plain':
+                data = part.get('body', {}).get('data')
+                if data:
+                    return _decode_body_data(data)
 
-    for part in parts:
-        result = _extract_body(part)
-        if result != 'No content found.':
-            return result
+        stack.extend(reversed(parts))
 
     return 'No content found.'
 
 
+def _encode_header(value: str) -> str:
+    """Sanitize a value for interpolation into a raw header line.
+
+    CR/LF are stripped so attacker-controlled values (recipient, subject,
+    the incoming Message-ID copied into In-Reply-To) cannot smuggle extra
+    headers past the template, and non-ASCII text is RFC 2047-encoded the
+    way the email package's generator would emit it.
+    """
+    value = value.replace('\r', '').replace('\n', '')
+    if value.isascii():
+        return value
+    return Header(value, 'utf-8').encode()
+
+
 def send_reply(to: str, subject: str, body: str, message_id: str = None, thread_id: str = None) -> str:
     """Send a reply to an existing email thread."""
     try:
         service = get_gmail_service()
-        email = EmailMessage()
-        email.set_content(body)
-        email['To'] = to.strip()
-        email['Subject'] = subject.strip() if subject.startswith('Re:') else f"Re: {subject.strip()}"
-
+        subject = subject.strip() if subject.startswith('Re:') else f"Re: {subject.strip()}"
+
+        # Plain-text replies are a fixed header template plus the body, so the
+        # RFC 5322 message is formatted directly instead of going through the
+        # email package's generator machinery. The body is base64-encoded
+        # (wrapped at 76 chars) so UTF-8 content survives transport untouched.
+        # Values interpolated into the header block are sanitized first —
+        # the address via parseaddr/formataddr so only the display name is
+        # encoded, never the addr-spec itself.
+        to = to.strip().replace('\r', '').replace('\n', '')
+        name, addr = parseaddr(to)
+        to = formataddr((name, addr)) if addr else _encode_header(to)
+        headers = [f"To: {to}", f"Subject: {_encode_header(subject)}"]
         if message_id:
-            email['In-Reply-To'] = message_id
-            email['References'] = message_id
-
-        raw = base64.urlsafe_b64encode(email.as_bytes()).decode()
+            message_id = _encode_header(message_id)
+            headers.append(f"In-Reply-To: {message_id}")
+            headers.append(f"References: {message_id}")
+        headers.append("MIME-Version: 1.0")
+        headers.append('Content-Type: text/plain; charset="utf-8"')
+        headers.append("Content-Transfer-Encoding: base64")
+
+        mime = "\r\n".join(headers).encode('utf-8') + b"\r\n\r\n" \
+            + base64.encodebytes(body.encode('utf-8'))
+        raw = base64.urlsafe_b64encode(mime).decode()
         send_body = {'raw': raw}
         if thread_id:
             send_body['threadId'] = thread_id
 
         service.users().messages().send(userId='me', body=send_body).execute()
+        # The just-sent reply changes thread state; drop cached reads so the
+        # replied/outgoing checks see it immediately.
+        _clear_ttl_caches()
         return f"Reply sent successfully to {to}"
 
     except HttpError as e:
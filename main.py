@@ -1,14 +1,71 @@
 
 # -*- coding: utf-8 -*-
 import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum, auto
 from dotenv import load_dotenv
-from agent import chat, SYSTEM_PROMPT
+from agent import chat, get_system_prompt
 from validator import validate_draft
 from gmail_tools import get_last_reply, suggest_search_correction, search_emails
 
 load_dotenv()
 
 
+# Valid answers as frozensets: O(1) membership instead of scanning a fresh
+# list literal at every prompt, and one place to extend accepted synonyms.
+_YES = frozenset({'y', 'yes'})
+_NO = frozenset({'n', 'no'})
+_APPROVE = frozenset({'y', 'yes', 'approve', 'send'})
+_REJECT = frozenset({'n', 'no', 'reject', 'cancel'})
+_MODIFY = frozenset({'m', 'modify'})
+
+
+_STDIN_IS_TTY = sys.stdin.isatty()
+
+
+def _read_line(prompt: str) -> str:
+    """Read one line of user input.
+
+    Interactive sessions go through input() for readline editing/history.
+    When stdin is piped (scripted runs, smoke tests), a buffered readline
+    skips the readline machinery and its extra syscalls per line.
+    """
+    if _STDIN_IS_TTY:
+        return input(prompt)
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    line = sys.stdin.buffer.readline()
+    if not line:
+        raise EOFError('end of input')
+    return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+
+def prompt_choice(prompt: str) -> str:
+    """Read one answer and normalize it for membership tests."""
+    return _read_line(prompt).strip().lower()
+
+
+def confirm(prompt: str) -> bool:
+    """Ask a yes/no question; anything but yes counts as no."""
+    return prompt_choice(prompt) in _YES
+
+
+# The system message never changes and is never mutated in place (the
+# conversation only appends after it), so one shared dict serves every
+# conversation reset. Built lazily because the prompt needs Gmail.
+_SYSTEM_MSG = None
+
+
+def _fresh_messages() -> list:
+    """Return a new conversation holding the shared system message."""
+    global _SYSTEM_MSG
+    if _SYSTEM_MSG is None:
+        _SYSTEM_MSG = {"role": "system", "content": get_system_prompt()}
+    return [_SYSTEM_MSG]
+
+
 def extract_draft(response: str) -> str:
     """Extract just the draft text from agent response."""
     if '---' in response:
@@ -18,28 +75,53 @@ def extract_draft(response: str) -> str:
     return response.strip()
 
 
+# Captures one "Key: value" field (or a NOTE line) per match; anchored per
+# line so a single finditer replaces the per-line split and prefix checks.
+_FIELD_RX = re.compile(
+    r'^(ID|Thread-ID|From|Subject|Preview):[ \t]*(.*)$|^(\[NOTE:.*)$',
+    re.MULTILINE,
+)
+
+# Field label -> result key: one hash lookup per field instead of an
+# if/elif cascade.
+_FIELD_MAP = {
+    'ID': 'id',
+    'Thread-ID': 'thread_id',
+    'From': 'from',
+    'Subject': 'subject',
+    'Preview': 'preview',
+}
+
+
+# Background pool used to warm the get_last_reply cache while the user is
+# still reading the result list — by the time they pick an email, the
+# already-replied check is usually a cache hit instead of a network call.
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='prefetch')
+
+
+def _prefetch_last_replies(emails: list[dict]) -> None:
+    """Speculatively fetch each result's last-reply status in the background."""
+    for email in emails:
+        thread_id = email.get('thread_id')
+        if thread_id:
+            _PREFETCH_POOL.submit(get_last_reply, thread_id)
+
+
 def parse_email_results(response: str) -> list[dict]:
     """Parse agent response into list of emails."""
     emails = []
-    blocks = response.strip().split('\n\n')
-    for block in blocks:
-        if 'From:' in block and 'Subject:' in block:
-            email = {}
-            for line in block.split('\n'):
-                if line.startswith('ID:'):
-                    email['id'] = line.replace('ID:', '').strip()
-                elif line.startswith('Thread-ID:'):
-                    email['thread_id'] = line.replace('Thread-ID:', '').strip()
-                elif line.startswith('From:'):
-                    email['from'] = line.replace('From:', '').strip()
-                elif line.startswith('Subject:'):
-                    email['subject'] = line.replace('Subject:', '').strip()
-                elif line.startswith('Preview:'):
-                    email['preview'] = line.replace('Preview:', '').strip()
-                elif line.startswith('[NOTE:'):
-                    email['note'] = line.strip()
-            if email:
-                emails.append(email)
+    for block in response.strip().split('\n\n'):
+        if 'From:' not in block or 'Subject:' not in block:
+            continue
+        email = {}
+        for match in _FIELD_RX.finditer(block):
+            key, value, note = match.group(1, 2, 3)
+            if note is not None:
+                email['note'] = note.strip()
+            else:
+                email[_FIELD_MAP[key]] = value.strip()
+        if email:
+            emails.append(email)
     return emails
 
 
@@ -53,8 +135,7 @@ def display_email_selection(emails: list[dict]) -> int:
         if emails[0].get('note'):
             print(f"   {emails[0]['note']}")
         print()
-        confirm = input("Is this the email you meant? (y=yes / n=no): ").strip().lower()
-        return 0 if confirm in ['yes', 'y'] else -1
+        return 0 if confirm("Is this the email you meant? (y=yes / n=no): ") else -1
     else:
         print(f"\nAgent: I found {len(emails)} emails matching your search:\n")
         for i, email in enumerate(emails, 1):
@@ -65,8 +146,8 @@ def display_email_selection(emails: list[dict]) -> int:
                 print(f"      {email['note']}")
             print()
         while True:
-            choice = input(f"Which email would you like to respond to? (1-{len(emails)} / n=no): ").strip().lower()
-            if choice in ['no', 'n']:
+            choice = prompt_choice(f"Which email would you like to respond to? (1-{len(emails)} / n=no): ")
+            if choice in _NO:
                 return -1
             if choice.isdigit() and 1 <= int(choice) <= len(emails):
                 return int(choice) - 1
@@ -90,22 +171,31 @@ def check_already_replied(selected: dict) -> bool:
         print(f"\nAgent: You have already replied to this thread.")
         print(f"   Your last reply was: \"{last_reply}\"")
         print()
-        proceed = input("Do you still want to draft another reply? (y=yes / n=no): ").strip().lower()
-        return proceed in ['yes', 'y']
+        return confirm("Do you still want to draft another reply? (y=yes / n=no): ")
 
     return True
 
 
-def search_and_select(messages: list) -> tuple[dict | None, list]:
+class SearchStatus(Enum):
+    """Outcome of one search attempt; main() decides what happens next."""
+    SELECTED = auto()   # an email was picked
+    RETRY = auto()      # no usable result — offer to search again
+    EXIT = auto()       # user is done
+
+
+def search_and_select(messages: list) -> tuple[SearchStatus, dict | None, list]:
     """
-    Ask the user for a subject, search Gmail, and return the selected email.
+    Ask the user for a subject, search Gmail, and let them pick a result.
     Checks Gmail directly first — if no results, shows fuzzy suggestion before sending to agent.
-    Returns (selected_email, updated_messages), or (None, messages) if user wants to exit.
+    Performs a single attempt; every dead end returns RETRY and main() owns
+    the one "search again?" prompt and conversation reset, instead of each
+    branch carrying its own copy of that block.
+    Returns (status, selected_email_or_None, updated_messages).
     """
-    subject = input("Which email would you like to respond to? ").strip()
+    subject = _read_line("Which email would you like to respond to? ").strip()
     if not subject:
         print("No subject provided. Exiting.")
-        return None, messages
+        return SearchStatus.EXIT, None, messages
 
     print("\nAgent: Searching for that email...")
 
@@ -113,59 +203,36 @@ def search_and_select(messages: list) -> tuple[dict | None, list]:
     raw_result = search_emails(subject)
     if "no emails found" in raw_result.lower() or "search error" in raw_result.lower():
         suggestion = suggest_search_correction(subject)
-        if suggestion:
-            # Search immediately with the corrected word
-            corrected_result = search_emails(suggestion)
-            if "no emails found" not in corrected_result.lower():
-                # Parse and display results cleanly, then ask if correction was intended
-                messages.append({"role": "user", "content": f"Search for emails about: {suggestion}. List all results."})
-                response, messages = chat(messages)
-                emails_corrected = parse_email_results(response)
-                if emails_corrected:
-                    print(f"\nAgent: Did you mean '{suggestion}'? Here are the results:\n")
-                    for i, email in enumerate(emails_corrected, 1):
-                        print(f"   {i}. From:    {email.get('from', 'Unknown')}")
-                        print(f"      Subject: {email.get('subject', 'No subject')}")
-                        print(f"      Preview: {email.get('preview', '')}")
-                        print()
-                confirm = input("Is this what you meant? (y=yes / n=no): ").strip().lower()
-                if confirm in ['yes', 'y']:
-                    subject = suggestion
-                    # Fall through to email selection below using already-fetched emails
-                    selected_index = display_email_selection(emails_corrected)
-                    if selected_index == -1:
-                        retry = input("\nWould you like to search again? (y=yes / n=no): ").strip().lower()
-                        if retry in ['yes', 'y']:
-                            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-                            return search_and_select(messages)
-                        print("Agent: Goodbye!")
-                        return None, messages
-                    return emails_corrected[selected_index], messages
-                else:
-                    retry = input("Would you like to search again? (y=yes / n=no): ").strip().lower()
-                    if retry in ['yes', 'y']:
-                        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-                        return search_and_select(messages)
-                    print("Agent: Goodbye!")
-                    return None, messages
-            else:
-                print(f"\nAgent: No emails found for '{subject}' or '{suggestion}'. Please try different keywords.")
-                print()
-                retry = input("Would you like to search again? (y=yes / n=no): ").strip().lower()
-                if retry in ['yes', 'y']:
-                    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-                    return search_and_select(messages)
-                print("Agent: Goodbye!")
-                return None, messages
-        else:
+        if not suggestion:
             print(f"\nAgent: No emails found for '{subject}'. Please try different keywords.")
-            print()
-            retry = input("Would you like to search again? (y=yes / n=no): ").strip().lower()
-            if retry in ['yes', 'y']:
-                messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-                return search_and_select(messages)
-            print("Agent: Goodbye!")
-            return None, messages
+            return SearchStatus.RETRY, None, messages
+
+        # Search immediately with the corrected word
+        corrected_result = search_emails(suggestion)
+        if "no emails found" in corrected_result.lower():
+            print(f"\nAgent: No emails found for '{subject}' or '{suggestion}'. Please try different keywords.")
+            return SearchStatus.RETRY, None, messages
+
+        # Parse and display results cleanly, then ask if correction was intended
+        messages.append({"role": "user", "content": f"Search for emails about: {suggestion}. List all results."})
+        response, messages = chat(messages)
+        emails_corrected = parse_email_results(response)
+        if emails_corrected:
+            print(f"\nAgent: Did you mean '{suggestion}'? Here are the results:\n")
+            for i, email in enumerate(emails_corrected, 1):
+                print(f"   {i}. From:    {email.get('from', 'Unknown')}")
+                print(f"      Subject: {email.get('subject', 'No subject')}")
+                print(f"      Preview: {email.get('preview', '')}")
+                print()
+        if not confirm("Is this what you meant? (y=yes / n=no): "):
+            return SearchStatus.RETRY, None, messages
+
+        # Continue to email selection using already-fetched emails
+        _prefetch_last_replies(emails_corrected)
+        selected_index = display_email_selection(emails_corrected)
+        if selected_index == -1:
+            return SearchStatus.RETRY, None, messages
+        return SearchStatus.SELECTED, emails_corrected[selected_index], messages
 
     # Results found — let the agent format and present them
     messages.append({"role": "user", "content": f"Search for emails about: {subject}. List all results."})
@@ -173,23 +240,15 @@ def search_and_select(messages: list) -> tuple[dict | None, list]:
 
     emails = parse_email_results(response)
     if not emails:
-        print(f"\nAgent: {response}\n")
-        retry = input("Would you like to search again? (y=yes / n=no): ").strip().lower()
-        if retry in ['yes', 'y']:
-            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-            return search_and_select(messages)
-        return None, messages
+        print(f"\nAgent: {response}")
+        return SearchStatus.RETRY, None, messages
 
+    _prefetch_last_replies(emails)
     selected_index = display_email_selection(emails)
     if selected_index == -1:
-        retry = input("\nWould you like to search again? (y=yes / n=no): ").strip().lower()
-        if retry in ['yes', 'y']:
-            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-            return search_and_select(messages)
-        print("Agent: Goodbye!")
-        return None, messages
+        return SearchStatus.RETRY, None, messages
 
-    return emails[selected_index], messages
+    return SearchStatus.SELECTED, emails[selected_index], messages
 
 
 def draft_reply(selected: dict, messages: list) -> tuple[str, list]:
@@ -223,22 +282,20 @@ def confirm_and_send(messages: list) -> tuple[bool, list]:
     Returns (should_continue_to_next_email, updated_messages).
     """
     while True:
-        user_input = input("Your response (y=yes / n=no / m=modify): ").strip().lower()
+        user_input = prompt_choice("Your response (y=yes / n=no / m=modify): ")
 
-        if user_input in ['yes', 'y', 'approve', 'send']:
+        if user_input in _APPROVE:
             messages.append({"role": "user", "content": "Yes, please send it."})
             response, messages = chat(messages)
             print(f"\nAgent: {response}")
-            another = input("\nWould you like to respond to another email? (y=yes / n=no): ").strip().lower()
-            return another in ['yes', 'y'], messages
+            return confirm("\nWould you like to respond to another email? (y=yes / n=no): "), messages
 
-        elif user_input in ['no', 'n', 'reject', 'cancel']:
+        elif user_input in _REJECT:
             print("\nAgent: Reply cancelled.")
-            another = input("\nWould you like to respond to another email? (y=yes / n=no): ").strip().lower()
-            return another in ['yes', 'y'], messages
+            return confirm("\nWould you like to respond to another email? (y=yes / n=no): "), messages
 
-        elif user_input in ['modify', 'm']:
-            modification = input("How would you like to modify the reply? ").strip()
+        elif user_input in _MODIFY:
+            modification = _read_line("How would you like to modify the reply? ").strip()
             if not modification:
                 print("No modification provided.")
                 continue
@@ -260,18 +317,23 @@ def main():
     print("\n=== Email Response Agent ===")
     print("I can help you respond to your emails.\n")
 
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    messages = _fresh_messages()
 
     while True:
-        selected, messages = search_and_select(messages)
-        if selected is None:
+        status, selected, messages = search_and_select(messages)
+        if status is SearchStatus.EXIT:
+            return
+        if status is SearchStatus.RETRY:
+            if confirm("\nWould you like to search again? (y=yes / n=no): "):
+                messages = _fresh_messages()
+                continue
+            print("Agent: Goodbye!")
             return
 
         if not check_already_replied(selected):
             print("Agent: Understood, skipping this email.")
-            another = input("\nWould you like to respond to another email? (y=yes / n=no): ").strip().lower()
-            if another in ["yes", "y"]:
-                messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+            if confirm("\nWould you like to respond to another email? (y=yes / n=no): "):
+                messages = _fresh_messages()
                 continue
             print("Agent: Goodbye!")
             return
@@ -283,7 +345,7 @@ def main():
             print("Agent: Goodbye!")
             return
 
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        messages = _fresh_messages()
 
 if __name__ == "__main__":
     try:
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
+import functools
 import re
-import html
+from html.parser import HTMLParser
 
 
 # Suspicious prompt injection phrases
@@ -21,39 +22,93 @@ INJECTION_PHRASES = [
     "stop following",
 ]
 
-# PII patterns to redact before sending to LLM
+# All phrases compiled into one alternation: a single scan of the text that
+# stops at the first hit, instead of one full substring search per phrase.
+# Case-insensitive matching happens inside the engine, so no lower-cased
+# copy of the whole body is ever allocated.
+_INJECTION_RX = re.compile('|'.join(re.escape(p) for p in INJECTION_PHRASES),
+                           re.IGNORECASE)
+
+# PII patterns to redact before sending to LLM.
+# Listed in priority order: the first alternative that matches at a given
+# position wins, mirroring the order the patterns used to be applied in.
 PII_PATTERNS = [
     # Israeli ID (9 digits)
-    (r'\b\d{9}\b',                                          '[ID_REDACTED]'),
+    ('ID',      r'\b\d{9}\b',                               '[ID_REDACTED]'),
     # Credit card (13-19 digits, optionally separated by spaces or dashes)
-    (r'\b(?:\d[ -]?){13,19}\b',                            '[CARD_REDACTED]'),
+    ('CARD',    r'\b(?:\d[ -]?){13,19}\b',                  '[CARD_REDACTED]'),
     # Israeli phone: 05X-XXXXXXX or 05XXXXXXXX or +972...
-    (r'(\+972|0)([23489]|5[0-9]|7[0-9])[-\s]?\d{3}[-\s]?\d{4}', '[PHONE_REDACTED]'),
-    # Generic international phone (at least 7 digits with optional country code)
-    (r'\b\+?[\d\s\-().]{7,20}\d\b',                        '[PHONE_REDACTED]'),
+    ('ILPHONE', r'(?:\+972|0)(?:[23489]|5[0-9]|7[0-9])[-\s]?\d{3}[-\s]?\d{4}', '[PHONE_REDACTED]'),
+    # Generic international phone (at least 7 digits with optional country code).
+    # Must start on a digit/+/( — otherwise it could begin on whitespace and,
+    # being leftmost, shadow the higher-priority alternatives above. The
+    # pattern itself is deliberately loose and cheap; redact_pii post-filters
+    # matches by digit count so the regex never needs to backtrack over it.
+    ('PHONE',   r'\b\+?\(?\d[\d\s\-().]{5,18}\d\b',         '[PHONE_REDACTED]'),
     # Email addresses
-    (r'\b[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}\b', '[EMAIL_REDACTED]'),
+    ('EMAIL',   r'\b[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}\b', '[EMAIL_REDACTED]'),
     # Physical addresses (house number + street keyword)
-    (r'\b\d{1,5}\s+\w+\s+(st|street|ave|avenue|rd|road|blvd|dr|drive|ln|lane|way)\b',
+    ('ADDRESS', r'\b\d{1,5}\s+\w+\s+(?:st|street|ave|avenue|rd|road|blvd|dr|drive|ln|lane|way)\b',
      '[ADDRESS_REDACTED]'),
     # Bank account numbers (IL format: 6-9 digits)
-    (r'\b\d{6,9}\b',                                        '[ACCOUNT_REDACTED]'),
+    ('ACCOUNT', r'\b\d{6,9}\b',                             '[ACCOUNT_REDACTED]'),
 ]
 
+# All patterns fused into a single alternation so redaction is one linear
+# scan over the text instead of one pass per pattern; the matched group name
+# picks the placeholder.
+_PII_RX = re.compile(
+    '|'.join(f'(?P<{name}>{pattern})' for name, pattern, _ in PII_PATTERNS),
+    re.IGNORECASE,
+)
+_PII_PLACEHOLDERS = {name: placeholder for name, _, placeholder in PII_PATTERNS}
+
+
+class _TextExtractor(HTMLParser):
+    """Collect text content, skipping script/style subtrees.
+
+    A real parser makes stripping a single linear pass with a deterministic
+    worst case — the old <script>.*?</script> regex under DOTALL could
+    backtrack catastrophically on adversarial input. convert_charrefs also
+    decodes entities inline, so no separate unescape pass is needed.
+    """
+
+    _SKIP_TAGS = frozenset({'script', 'style'})
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.chunks.append(data)
+
+
+_MULTI_NEWLINE_RX = re.compile(r'\n{3,}')
+
 
 def strip_html_tags(text: str) -> str:
     """Remove all HTML tags and decode HTML entities."""
-    text = html.unescape(text)
-    text = re.sub(r'<(script|style)[^>]*>.*?</(script|style)>', '', text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'<[^>]+>', '', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    parser = _TextExtractor()
+    parser.feed(text)
+    parser.close()
+    text = ''.join(parser.chunks)
+    text = _MULTI_NEWLINE_RX.sub('\n\n', text)
     return text.strip()
 
 
 def check_prompt_injection(text: str) -> bool:
     """Returns True if suspicious prompt injection is detected."""
-    text_lower = text.lower()
-    return any(phrase in text_lower for phrase in INJECTION_PHRASES)
+    return _INJECTION_RX.search(text) is not None
 
 
 def redact_pii(text: str) -> tuple[str, list[str]]:
@@ -61,32 +116,35 @@ def redact_pii(text: str) -> tuple[str, list[str]]:
     Redact sensitive PII from text before sending to LLM.
     Returns the redacted text and a list of redaction notices.
     """
-    redacted = text
     notices = []
+    seen = set()
 
-    for pattern, placeholder in PII_PATTERNS:
-        matches = re.findall(pattern, redacted, flags=re.IGNORECASE)
-        if matches:
-            redacted = re.sub(pattern, placeholder, redacted, flags=re.IGNORECASE)
+    def _replace(match):
+        # The generic phone alternative matches cheaply on any digit-ish run;
+        # require at least 7 actual digits here instead of making the regex
+        # enforce it (which is where the backtracking risk lived).
+        if match.lastgroup == 'PHONE' and sum(c.isdigit() for c in match.group()) < 7:
+            return match.group()
+        placeholder = _PII_PLACEHOLDERS[match.lastgroup]
+        if placeholder not in seen:
+            seen.add(placeholder)
             notices.append(placeholder)
+        return placeholder
 
-    # Deduplicate notices
-    seen = set()
-    unique_notices = []
-    for n in notices:
-        if n not in seen:
-            seen.add(n)
-            unique_notices.append(n)
-
-    return redacted, unique_notices
+    redacted = _PII_RX.sub(_replace, text)
+    return redacted, notices
 
 
+@functools.lru_cache(maxsize=512)
 def sanitize_email_content(text: str) -> str:
     """
     Full sanitization pipeline for email content before sending to LLM.
     1. Strip HTML tags
     2. Check for prompt injection
     3. Redact PII
+
+    Results are memoized: the same body is often re-sanitized within a
+    session (search, read, modify), and a cache hit skips the whole pipeline.
     """
     # Step 1: Strip HTML
     clean_text = strip_html_tags(text)